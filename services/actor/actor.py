@@ -1,9 +1,30 @@
 import yaml
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
+from functools import lru_cache
+from typing import List
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from hallucination_engine import HallucinationEngine
 
+# libyaml's C parser when available, pure-Python otherwise
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Shared keep-alive pool so each turn reuses an open connection to Ollama
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=128))
+SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=128))
+OLLAMA_TIMEOUT = 30
+
+@lru_cache(maxsize=None)
+def load_personas(path="personas.yaml"):
+    """Parses the persona file once; every Actor shares the result."""
+    with open(path, "r") as f:
+        return yaml.load(f, Loader=YAML_LOADER)["personas"]
+
 class Actor:
     def __init__(self, ollama_url="http://ollama:11434", model="llama3"):
         self.ollama_url = ollama_url
@@ -13,15 +34,14 @@ class Actor:
         self.current_persona = "hazel" # Default
 
     def _load_personas(self):
-        with open("personas.yaml", "r") as f:
-            return yaml.safe_load(f)["personas"]
+        return load_personas()
 
     def set_persona(self, persona_name):
         if persona_name in self.personas:
             self.current_persona = persona_name
             print(f"Actor Mask Swapped: {self.personas[persona_name]['name']}")
 
-    def generate_response(self, transcript_history):
+    def _build_payload(self, transcript_history):
         # Scan for AI
         last_exchange = transcript_history[-1] if transcript_history else ""
         is_ai = self.he.detect_ai_artifacts(last_exchange)
@@ -33,22 +53,55 @@ class Actor:
             trick = self.he.generate_contradiction()
             transcript_history.append(f"Instruction: Inject contradiction -> {trick}")
 
-        payload = {
+        return {
             "model": self.model,
             "system": system_prompt,
             "prompt": "\n".join(transcript_history),
-            "stream": False
+            "stream": True
         }
 
+    def stream_response(self, transcript_history):
+        """Yields reply tokens as Ollama decodes them so TTS can start early."""
+        payload = self._build_payload(transcript_history)
+
         try:
-            response = requests.post(f"{self.ollama_url}/api/generate", json=payload)
-            response.raise_for_status()
-            return response.json()["response"]
+            with SESSION.post(f"{self.ollama_url}/api/generate", json=payload, timeout=OLLAMA_TIMEOUT, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
         except Exception as e:
-            return f"Error connecting to Actor Model: {str(e)}"
+            yield f"Error connecting to Actor Model: {str(e)}"
+
+    def generate_response(self, transcript_history):
+        return "".join(self.stream_response(transcript_history))
+
+app = FastAPI()
+actor = Actor(
+    ollama_url=os.environ.get("OLLAMA_URL", "http://ollama:11434"),
+)
+actor.set_persona(os.environ.get("DEFAULT_PERSONA", actor.current_persona))
+
+class GenerateRequest(BaseModel):
+    transcript_history: List[str]
+
+@app.post('/generate')
+def generate(body: GenerateRequest):
+    # Sync route: Starlette iterates the token stream on its threadpool,
+    # so a slow Ollama decode never blocks the event loop
+    tokens = actor.stream_response(body.transcript_history)
+    return StreamingResponse(tokens, media_type="text/plain")
+
+@app.get('/health')
+async def health():
+    return {"status": "ok", "persona": actor.current_persona}
 
 if __name__ == "__main__":
-    actor = Actor()
     print(f"Actor Service Started. Using Persona: {actor.current_persona}")
     
     # Mock Interaction
@@ -4,6 +4,13 @@ import json
 import base64
 import os
 import yaml
+import httpx
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+try:
+    import h2 # httpx only speaks HTTP/2 with the httpx[http2] extra installed
+except ImportError:
+    h2 = None
 from elevenlabs.client import AsyncElevenLabs
 
 # Load settings
@@ -13,35 +20,54 @@ with open(CONFIG_PATH, "r") as f:
 
 ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY", "your_api_key")
 VOICE_ID = voice_config.get("voice_id", "your_brian_clone_id")
+MODEL_ID = voice_config.get("model_id", "eleven_flash_v2_5")
+# Everything but the text is fixed for the life of the process
+TTS_OPTIONS = {"voice": VOICE_ID, "model": MODEL_ID, "stream": True}
 ASTERISK_IP = "0.0.0.0"
 AUDIOSOCKET_PORT = int(os.environ.get("AUDIOSOCKET_PORT", 9092))
 INTERRUPT_THRESHOLD = 500  # RMS energy threshold for barge-in detection
+FRAME_SAMPLES = 160  # 20ms of audio @ 8kHz SLIN
+HOP_SAMPLES = 80  # Windows overlap by half so onsets aren't split across frames
+READ_BYTES = 4096  # Drain whatever the socket has, then window it in one pass
 
-client = AsyncElevenLabs(api_key=ELEVENLABS_API_KEY)
+# One HTTP/2 pool for every session: TTS requests multiplex over a warm TLS
+# connection instead of handshaking per call (keep-alive HTTP/1.1 without h2)
+http_client = httpx.AsyncClient(
+    http2=h2 is not None,
+    timeout=30.0,
+    limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=60)
+)
+client = AsyncElevenLabs(api_key=ELEVENLABS_API_KEY, httpx_client=http_client)
 
-def calculate_energy(audio_data):
-    """Calculates RMS energy of raw SLIN audio (16-bit)."""
-    import struct
-    if not audio_data: return 0
-    count = len(audio_data) // 2
-    format = "<" + "h" * count
-    shorts = struct.unpack(format, audio_data)
-    sum_squares = sum(s*s for s in shorts)
-    return (sum_squares / count) ** 0.5
+def window_energies(samples):
+    """RMS of every FRAME_SAMPLES window (HOP_SAMPLES apart) of an int16 array."""
+    if samples.size < FRAME_SAMPLES:
+        return np.empty(0)
+    windows = sliding_window_view(samples, FRAME_SAMPLES)[::HOP_SAMPLES].astype(np.int64)
+    return np.sqrt(np.einsum("ij,ij->i", windows, windows) / FRAME_SAMPLES)
 
 async def handle_asterisk_connection(reader, writer):
     print("🚀 Scammer connected to the Dojo.")
     
     # Task to read from scammer (Barge-in detection)
     async def read_from_scammer():
+        carry = np.empty(0, dtype=np.int16)  # Samples not yet covered by a full window
+        odd = b""
         while True:
             try:
-                data = await reader.read(320) # 20ms of audio @ 8kHz SLIN
+                data = await reader.read(READ_BYTES)
                 if not data: break
                 
-                energy = calculate_energy(data)
-                if energy > INTERRUPT_THRESHOLD:
-                    print(f"🔥 [BARGE-IN] Scammer energy detected: {energy:.2f}")
+                if odd:
+                    data = odd + data
+                usable = len(data) & ~1
+                odd = data[usable:]
+                samples = np.concatenate((carry, np.frombuffer(data, dtype="<i2", count=usable // 2)))
+
+                energies = window_energies(samples)
+                carry = samples[energies.size * HOP_SAMPLES:]
+                if energies.size and energies.max() > INTERRUPT_THRESHOLD:
+                    print(f"🔥 [BARGE-IN] Scammer energy detected: {energies.max():.2f}")
                     # Signal the write task to pivot or pause
                     # This would ideally cancel the current stream and start a "Soft Interrupt"
             except Exception as e:
@@ -52,12 +78,7 @@ async def handle_asterisk_connection(reader, writer):
     async def write_to_scammer():
         response_text = "Wait, hold on... you said you're from where? My dog Steve just stepped on my keyboard."
         try:
-            async for audio_chunk in client.generate(
-                text=response_text, 
-                voice=VOICE_ID, 
-                model=voice_config.get("model_id", "eleven_flash_v2_5"),
-                stream=True
-            ):
+            async for audio_chunk in client.generate(text=response_text, **TTS_OPTIONS):
                 writer.write(audio_chunk)
                 await writer.drain()
         except Exception as e:
@@ -1,20 +1,43 @@
 import random
+import re
 import time
 
+# Scripted-bot tells and how much each one pushes the AI score.
+AI_KEYWORD_WEIGHTS = {
+    "kindly": 0.3,
+}
+AI_SCORE_THRESHOLD = 0.4
+LONG_MONOLOGUE_CHARS = 100
+
+# One case-insensitive pass over the chunk for every keyword. Each keyword
+# gets its own named group: lowercasing the matched text doesn't always give
+# the keyword back (e.g. "KİNDLY"), so weights are looked up by group name.
+_KEYWORD_GROUPS = {f"kw{i}": kw for i, kw in enumerate(sorted(AI_KEYWORD_WEIGHTS, key=len, reverse=True))}
+KEYWORD_PATTERN = re.compile(
+    "|".join(f"(?P<{group}>{re.escape(kw)})" for group, kw in _KEYWORD_GROUPS.items()),
+    re.IGNORECASE,
+)
+MAX_KEYWORD_SCORE = sum(AI_KEYWORD_WEIGHTS.values())
+
 class HallucinationEngine:
+    # Shared, read-only phrase tables; instances only alias them
+    CONTRADICTIONS = (
+        "Wait, I just remembered my credit card number starts with a 9, not a 4.",
+        "Oh, actually my computer is a Mac, wait... no it's a Linux box. Does that change the virus link?",
+        "I have two computers, the blue one and the square one. Which one is 'Windows'?",
+        "My address is 500 Maple St... but I also live at 123 Oak Ave. It's a quantum house."
+    )
+
+    LOGIC_BOMBS = (
+        "Can you explain why you need me to pay you money for a free prize? Does that violate the 2nd law of thermodynamics?",
+        "If your name is Steve from Microsoft, and my name is also Steve from Microsoft, are we the same process?",
+        "I've typed the code into the toaster like you asked, but it only smells like bread. Should it be smelling like data?"
+    )
+
     def __init__(self):
-        self.contradictions = [
-            "Wait, I just remembered my credit card number starts with a 9, not a 4.",
-            "Oh, actually my computer is a Mac, wait... no it's a Linux box. Does that change the virus link?",
-            "I have two computers, the blue one and the square one. Which one is 'Windows'?",
-            "My address is 500 Maple St... but I also live at 123 Oak Ave. It's a quantum house."
-        ]
-        
-        self.logic_bombs = [
-            "Can you explain why you need me to pay you money for a free prize? Does that violate the 2nd law of thermodynamics?",
-            "If your name is Steve from Microsoft, and my name is also Steve from Microsoft, are we the same process?",
-            "I've typed the code into the toaster like you asked, but it only smells like bread. Should it be smelling like data?"
-        ]
+        self.contradictions = self.CONTRADICTIONS
+        self.logic_bombs = self.LOGIC_BOMBS
+        self._rng = random.Random()
 
     def detect_ai_artifacts(self, transcript_chunk):
         """
@@ -22,19 +45,30 @@ class HallucinationEngine:
         In a real scenario, this would analyze acoustic artifacts or STT patterns.
         """
         # Placeholder for real detection logic
-        ai_score = 0
-        if "kindly" in transcript_chunk.lower(): ai_score += 0.3
-        if len(transcript_chunk) > 100: ai_score += 0.2 # Long monologue
-        
-        return ai_score > 0.4
+        ai_score = 0.2 if len(transcript_chunk) > LONG_MONOLOGUE_CHARS else 0 # Long monologue
+
+        # Skip the scan when even every keyword couldn't cross the threshold
+        if ai_score + MAX_KEYWORD_SCORE <= AI_SCORE_THRESHOLD:
+            return False
+
+        seen = set()
+        for match in KEYWORD_PATTERN.finditer(transcript_chunk):
+            keyword = _KEYWORD_GROUPS[match.lastgroup]
+            if keyword not in seen:
+                seen.add(keyword)
+                ai_score += AI_KEYWORD_WEIGHTS[keyword]
+                if ai_score > AI_SCORE_THRESHOLD:
+                    return True
+
+        return False
 
     def generate_contradiction(self):
         """Returns a phrase designed to confuse an LLM-based scammer."""
-        return random.choice(self.contradictions)
+        return self.contradictions[self._rng.randrange(len(self.contradictions))]
 
     def trigger_logic_bomb(self):
         """Returns a logic-based riddle or contradictory request."""
-        return random.choice(self.logic_bombs)
+        return self.logic_bombs[self._rng.randrange(len(self.logic_bombs))]
 
 if __name__ == "__main__":
     engine = HallucinationEngine()
@@ -1,14 +1,36 @@
-import torch
-import torchaudio
-from transformers import Wav2Vec2ForSequenceClassification, Wav2Vec2Processor
+import numpy as np
 import os
-import requests
-from flask import Flask, jsonify
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+import uvicorn
 
-app = Flask(__name__)
+@asynccontextmanager
+async def lifespan(app):
+    # Load the model in the background; /health reports when it is ready
+    start_detector_load()
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+SAMPLE_RATE = 16000
+WINDOW_SAMPLES = SAMPLE_RATE * 5 # Fixed 5s input so exported graphs see one shape
+LABELS = ["human", "deepfake"] # Model dependent labels - this is a categorical example
+
+# torch/transformers are imported inside the detector so the API process comes
+# up (and answers /health) before the multi-second model stack is loaded
+
+def int8_model_path(onnx_path):
+    """Where the INT8 copy of an exported model lives, next to the FP32 one."""
+    return f"{os.path.splitext(onnx_path)[0]}.int8.onnx"
 
 class DeepfakeDetector:
-    def __init__(self, model_path="anthony-v-peters/wav2vec2-base-superb-ks", processor_path="anthony-v-peters/wav2vec2-base-superb-ks"):
+    def __init__(self, model_path="anthony-v-peters/wav2vec2-base-superb-ks", processor_path="anthony-v-peters/wav2vec2-base-superb-ks", onnx_path=None, int8=False):
+        import torch
+        from transformers import Wav2Vec2ForSequenceClassification, Wav2Vec2Processor
+
         # Defaulting to a small, fast model for demo - in production use a specific deepfake fine-tuned one
         print(f"📡 Loading Deepfake Detection Model: {model_path}...")
         self.processor = Wav2Vec2Processor.from_pretrained(processor_path)
@@ -16,51 +38,240 @@ class DeepfakeDetector:
         self.model.eval()
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model.to(self.device)
-        print(f"✅ Model loaded on {self.device}")
+        self.session = self._load_onnx(onnx_path, int8) if onnx_path else None
+        self.dtype = torch.float32
+        if self.session is None and self.device.type == "cuda":
+            # FP16 halves weight/activation traffic on the GPU
+            self.model.half()
+            self.dtype = torch.float16
+        self._host = None
+        self._staged = None
+        self._lock = threading.Lock()
+        if self.session is None:
+            self._compile()
+        print(f"✅ Model loaded on {self.device}" + (" (ONNX Runtime)" if self.session else ""))
+
+    def _load_onnx(self, onnx_path, int8=False):
+        """Exports the model once and serves it through ONNX Runtime."""
+        import torch
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            print("⚠️ onnxruntime not installed, staying on PyTorch eager")
+            return None
+
+        if not os.path.exists(onnx_path):
+            print(f"📦 Exporting model to {onnx_path}...")
+            dummy = torch.zeros(1, WINDOW_SAMPLES, device=self.device)
+            torch.onnx.export(
+                self.model, dummy, onnx_path,
+                opset_version=17,
+                input_names=["input_values"],
+                output_names=["logits"],
+                dynamic_axes={"input_values": {0: "batch"}, "logits": {0: "batch"}}
+            )
+
+        if int8:
+            # INT8 weights quarter the bytes streamed per MatMul; ORT's CPU
+            # kernels pick up VNNI/sdot on their own where the CPU has them
+            int8_path = int8_model_path(onnx_path)
+            if not os.path.exists(int8_path):
+                try:
+                    # The quantizer needs the onnx package on top of onnxruntime
+                    from onnxruntime.quantization import quantize_dynamic, QuantType
+                except ImportError as e:
+                    print(f"⚠️ INT8 quantization unavailable ({e}), serving the FP32 graph")
+                    int8_path = None
+                else:
+                    print(f"📦 Quantizing model to {int8_path}...")
+                    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8, per_channel=True)
+            if int8_path is not None:
+                return ort.InferenceSession(int8_path, providers=["CPUExecutionProvider"])
+
+        available = ort.get_available_providers()
+        providers = [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available]
+        return ort.InferenceSession(onnx_path, providers=providers)
+
+    def _compile(self):
+        """Compiles the eager model and warms it up; stays eager if that fails."""
+        import torch
+        eager = self.model
+        try:
+            self.model = torch.compile(eager, mode="reduce-overhead", fullgraph=False)
+            self._detect([np.zeros(WINDOW_SAMPLES, dtype=np.float32)])
+            print("⚡ torch.compile warmup done")
+        except Exception as e:
+            print(f"⚠️ torch.compile unavailable, staying eager: {e}")
+            self.model = eager
+
+    def _prepare(self, audio_chunks):
+        """
+        Writes the segments into a reusable host buffer, trimmed/zero-padded to
+        WINDOW_SAMPLES and normalized the way the Wav2Vec2 feature extractor
+        would. The buffer is pinned on CUDA so the H2D copy can run async.
+        """
+        import torch
+        batch = len(audio_chunks)
+        if self._host is None or self._host.shape[0] < batch:
+            pin = self.device.type == "cuda"
+            self._host = torch.zeros((batch, WINDOW_SAMPLES), dtype=torch.float32, pin_memory=pin)
+            self._staged = torch.empty((batch, WINDOW_SAMPLES), dtype=self.dtype, device=self.device)
+
+        host = self._host.numpy()[:batch]
+        host.fill(0.0)
+        normalize = self.processor.feature_extractor.do_normalize
+        for row, chunk in zip(host, audio_chunks):
+            samples = np.asarray(chunk, dtype=np.float32)[:WINDOW_SAMPLES]
+            if normalize and samples.size:
+                samples = (samples - samples.mean()) / np.sqrt(samples.var() + 1e-7)
+            row[:samples.size] = samples
+        return host
+
+    def _classify(self, input_values):
+        """
+        Runs one forward pass over a (batch, WINDOW_SAMPLES) float32 array
+        and returns (class_ids, confidences) as Python lists.
+        """
+        import torch
+        if self.session is not None:
+            logits = torch.from_numpy(self.session.run(["logits"], {"input_values": input_values})[0])
+        else:
+            batch = input_values.shape[0]
+            with torch.inference_mode():
+                inputs = self._staged[:batch]
+                inputs.copy_(self._host[:batch], non_blocking=True)
+                logits = self.model(inputs).logits
+
+        # Softmax/argmax stay on-device; only batch-size scalars come back
+        confidences, class_ids = torch.softmax(logits.float(), dim=-1).max(dim=-1)
+        packed = torch.stack((class_ids.float(), confidences)).cpu().tolist()
+        return [int(i) for i in packed[0]], packed[1]
+
+    def detect_deepfake_batch(self, audio_chunks):
+        """
+        Classifies several audio segments in a single forward pass.
+        Returns a (scammer_type, confidence) tuple per segment.
+        """
+        try:
+            return self._detect(audio_chunks)
+        except Exception as e:
+            print(f"❌ Detection Error: {e}")
+            return [("unknown", 0.0)] * len(audio_chunks)
+
+    def _detect(self, audio_chunks):
+        # The staging buffers are shared, so one batch at a time goes through
+        with self._lock:
+            # Pad/trim every segment to the fixed window so batches share one shape
+            input_values = self._prepare(audio_chunks)
+            class_ids, confidences = self._classify(input_values)
+
+        results = []
+        for predicted_class_id, confidence in zip(class_ids, confidences):
+            scammer_type = LABELS[predicted_class_id] if predicted_class_id < len(LABELS) else "unknown"
+            results.append((scammer_type, confidence))
+        return results
 
     def detect_deepfake(self, audio_data):
         """
         Processes raw audio data and returns scammer type.
         """
-        # Placeholder for real-time audio chunk processing
         # In a real scenario, we'd receive a 5s segment of 16k SLIN
-        try:
-            # Preprocess
-            input_values = self.processor(audio_data, sampling_rate=16000, return_tensors="pt").input_values
-            input_values = input_values.to(self.device)
+        return self.detect_deepfake_batch([audio_data])[0]
 
-            with torch.no_grad():
-                logits = self.model(input_values).logits
+_detector = None
+_inference_pool = None
+_detector_lock = threading.Lock()
 
-            predicted_class_id = logits.argmax().item()
-            probabilities = torch.softmax(logits, dim=-1).cpu().numpy()[0]
+def get_detector():
+    """Builds the detector, and the inference pool that feeds it, on first use."""
+    global _detector, _inference_pool
+    with _detector_lock:
+        if _detector is None:
+            detector = DeepfakeDetector(
+                onnx_path=os.environ.get("DEEPFAKE_ONNX_PATH"),
+                int8=os.environ.get("DEEPFAKE_INT8", "0") == "1"
+            )
+            # Forward passes run here so callers on the audio path aren't held
+            # on the GIL. One worker: the detector's staging buffers admit one
+            # batch at a time, so more threads would only queue on its lock.
+            _inference_pool = ThreadPoolExecutor(max_workers=1)
+            # Published last: a non-None _detector means the pool is ready too
+            _detector = detector
+    return _detector
 
-            # Model dependent labels - this is a categorical example
-            labels = ["human", "deepfake"] 
-            scammer_type = labels[predicted_class_id] if predicted_class_id < len(labels) else "unknown"
-            
-            return scammer_type, float(probabilities[predicted_class_id])
-        except Exception as e:
-            print(f"❌ Detection Error: {e}")
-            return "unknown", 0.0
+_load_started = False
+_load_state_lock = threading.Lock()
+
+def start_detector_load():
+    """Starts building the detector in the background, once; never blocks."""
+    global _load_started
+    with _load_state_lock:
+        if _load_started:
+            return
+        _load_started = True
+    threading.Thread(target=_load_detector, daemon=True).start()
+
+def _load_detector():
+    global _load_started
+    try:
+        get_detector()
+    except Exception as e:
+        print(f"❌ Detector load failed: {e}")
+        # Let the next chunk (or restart) try again
+        with _load_state_lock:
+            _load_started = False
 
-detector = DeepfakeDetector()
 current_status = {"scammer_type": "unknown", "confidence": 0.0}
 
-@app.route('/status')
-def get_status():
-    return jsonify(current_status)
+FOREMAN_UPDATE_URL = "http://foreman:8080/triage/update"
+_notify_queue = queue.Queue()
+
+def _notify_worker():
+    """Drains Foreman updates off the audio path over one keep-alive session."""
+    import requests
+    session = requests.Session()
+    while True:
+        update = _notify_queue.get()
+        try:
+            session.post(FOREMAN_UPDATE_URL, json=update, timeout=2)
+        except Exception as e:
+            print(f"❌ Foreman notify failed: {e}")
+
+threading.Thread(target=_notify_worker, daemon=True).start()
+
+@app.get('/status')
+async def get_status():
+    return current_status
+
+@app.get('/health')
+async def health():
+    return {"status": "ok", "detector_ready": _detector is not None}
 
 # Logic to receive audio chunks from Asterisk AudioSocket (simplified)
 # This would be integrated into the bridge or a separate stream listener
 def process_stream_chunk(chunk):
+    """
+    Schedules detection for a chunk; returns a Future for the result. While
+    the model is still loading the chunk is skipped with ("unknown", 0.0)
+    so the audio caller is never held for the load.
+    """
+    if _detector is None:
+        start_detector_load()
+        skipped = Future()
+        skipped.set_result(("unknown", 0.0))
+        return skipped
+    return _inference_pool.submit(_process_stream_chunk, chunk)
+
+def _process_stream_chunk(chunk):
     global current_status
-    scammer_type, confidence = detector.detect_deepfake(chunk)
+    scammer_type, confidence = get_detector().detect_deepfake(chunk)
     current_status = {"scammer_type": scammer_type, "confidence": confidence}
     
     # Notify Foreman if type is AI
     if scammer_type == "deepfake" and confidence > 0.8:
-        requests.post("http://foreman:8080/triage/update", json={"scammer_type": "AI"})
+        _notify_queue.put_nowait({"scammer_type": "AI"})
+
+    return scammer_type, confidence
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5000)
+    uvicorn.run(app, host='0.0.0.0', port=5000, loop="uvloop", http="httptools")
@@ -1,13 +1,55 @@
 import os
 import time
 import json
+import atexit
 import hashlib
 import hmac
+import threading
+from json.encoder import encode_basestring_ascii
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+LEDGER_BATCH_SIZE = 32      # entries per writev
+LEDGER_FLUSH_INTERVAL = 0.05 # seconds a partial batch may wait
+WRITEV_MAX_LINES = 1024     # IOV_MAX on Linux
+
+# Same output as json.dumps(obj, sort_keys=True), without building an encoder per call
+canonical_json = json.JSONEncoder(sort_keys=True).encode
+
+# canonical_json's output for a process_log_entry payload with string fields,
+# with the sorted key order and separators written out
+LEDGER_ENTRY_JSON = '{"content": %s, "timestamp": %r, "type": %s, "user_id": %s}'
+
+class SignedEntry(dict):
+    """A signed ledger entry that carries the exact line it will be written as."""
+    def __init__(self, payload, line):
+        super().__init__(payload)
+        self.line = line
 
 class Auditor:
-    def __init__(self, key_path="/data/vault/keys/v2.4_aead.key"):
-        self.key_path = key_path
-        self._ensure_key()
+    def __init__(self, key_path="/data/vault/keys/v2.4_aead.key", ledger_path="/data/vault/forensic_ledger.jsonl", key_bytes=None):
+        self.ledger_path = ledger_path
+        if key_bytes is not None:
+            # In-memory key: no key file is created, read or watched for rotation
+            self.key_path = None
+            self._set_key(key_bytes)
+        else:
+            self.key_path = key_path
+            self._ensure_key()
+            self._load_key()
+
+        # Ledger appends are buffered per path and flushed in batches
+        self._ledger_fds = {}
+        self._pending = {}
+        self._ledger_lock = threading.Lock()
+        self._flush_timer = None
+        atexit.register(self.close)
 
     def _ensure_key(self):
         """Ensures the v2.4 AEAD key exists (placeholder logic)."""
@@ -19,6 +61,25 @@ class Auditor:
                 f.write(os.urandom(32)) # Generate a random 256-bit key
             print(f"Generated new v2.4 AEAD key at {self.key_path}")
 
+    def _load_key(self):
+        """Reads the key file once and remembers its mtime for rotation checks."""
+        with open(self.key_path, "rb") as f:
+            self._key_mtime = os.fstat(f.fileno()).st_mtime_ns
+            self._set_key(f.read())
+
+    def _set_key(self, key):
+        """Precomputes the per-scheme signing state for the key."""
+        self._key = key
+        block = key
+        if len(block) > 64:
+            block = hashlib.sha256(block).digest()
+        block = block.ljust(64, b"\x00")
+        self._ipad = hashlib.sha256(bytes(b ^ 0x36 for b in block))
+        self._opad = hashlib.sha256(bytes(b ^ 0x5C for b in block))
+
+        # BLAKE3 keyed mode takes exactly 32 bytes
+        self._blake3_key = self._key if len(self._key) == 32 else hashlib.sha256(self._key).digest()
+
     def detect_voice_theft(self, audio_metadata):
         """
         Simulates detection of recording software or specific 'Sampling' patterns.
@@ -42,36 +103,182 @@ class Auditor:
 
     def sign_transaction(self, payload):
         """
-        Applies a HMAC-SHA256 signature to the payload, 
-        simulating the 'Adversarial Handshake' signature mandate.
+        Signs the payload, simulating the 'Adversarial Handshake' signature
+        mandate. Uses BLAKE3 keyed hashing (sig_v2.5_) when available and
+        HMAC-SHA256 (sig_v2.4_) otherwise.
         """
-        with open(self.key_path, "rb") as f:
-            key = f.read()
+        # Stays on the stdlib encoder: the signed bytes are the canonical form
+        # existing ledger signatures were computed over
+        return self._sign_bytes(canonical_json(payload).encode())
 
-        payload_bytes = json.dumps(payload, sort_keys=True).encode()
-        signature = hmac.new(key, payload_bytes, hashlib.sha256).hexdigest()
-        
-        return f"sig_v2.4_{signature}"
+    def sign_batch(self, payloads):
+        """
+        Signs a burst of payloads, returning one signature per payload in
+        order; each matches what sign_transaction would return for it.
+        """
+        self._refresh_key()
+        scheme = "v2.5" if blake3 is not None else "v2.4"
+        return [self._digest(canonical_json(payload).encode(), scheme) for payload in payloads]
+
+    def _refresh_key(self):
+        # A stat is far cheaper than re-reading the key; reload only on rotation
+        if self.key_path is not None and os.stat(self.key_path).st_mtime_ns != self._key_mtime:
+            self._load_key()
+
+    def _sign_bytes(self, payload_bytes, scheme=None):
+        self._refresh_key()
+        if scheme is None:
+            scheme = "v2.5" if blake3 is not None else "v2.4"
+        return self._digest(payload_bytes, scheme)
+
+    def _digest(self, payload_bytes, scheme):
+        if scheme == "v2.5":
+            return f"sig_v2.5_{blake3.blake3(payload_bytes, key=self._blake3_key).hexdigest()}"
+
+        # Same digest as hmac.new(key, payload, sha256), but the padded key
+        # blocks are already absorbed so each sign is two OpenSSL updates.
+        inner = self._ipad.copy()
+        inner.update(payload_bytes)
+        outer = self._opad.copy()
+        outer.update(inner.digest())
+
+        return f"sig_v2.4_{outer.hexdigest()}"
+
+    def verify_transaction(self, payload, signature):
+        """Checks a ledger signature of either scheme in constant time."""
+        if not isinstance(signature, str):
+            return False
+        if signature.startswith("sig_v2.5_"):
+            if blake3 is None:
+                raise RuntimeError("blake3 is required to verify sig_v2.5 signatures")
+            scheme = "v2.5"
+        else:
+            scheme = "v2.4"
+        expected = self._sign_bytes(canonical_json(payload).encode(), scheme)
+        # Bytes, not str: compare_digest rejects non-ASCII str input
+        return hmac.compare_digest(expected.encode(), signature.encode())
 
     def process_log_entry(self, entry_type, content, user_id):
         """Signs and prepares a log entry for the Forensic Ledger."""
+        timestamp = time.time()
         payload = {
-            "timestamp": time.time(),
+            "timestamp": timestamp,
             "type": entry_type,
             "content": content,
             "user_id": user_id
         }
         
-        signature = self.sign_transaction(payload)
+        # Serialize once: the canonical bytes are both what gets signed and,
+        # with the signature spliced in, the ledger line itself
+        if type(entry_type) is str and type(content) is str and type(user_id) is str:
+            body = (LEDGER_ENTRY_JSON % (
+                encode_basestring_ascii(content), timestamp,
+                encode_basestring_ascii(entry_type), encode_basestring_ascii(user_id)
+            )).encode()
+        else:
+            body = canonical_json(payload).encode()
+        signature = self._sign_bytes(body)
         payload["signature"] = signature
-        
-        return payload
+        line = body[:-1] + b', "signature": "' + signature.encode() + b'"}\n'
+
+        return SignedEntry(payload, line)
+
+    def write_to_ledger(self, signed_entry, ledger_path=None, durable=False):
+        """
+        Queues the signed entry for the append-only ledger. Pass durable=True
+        to have it (and everything queued before it) synced before returning;
+        a flush that fails here raises OSError to the caller, and the entries
+        it couldn't write stay queued.
+        """
+        path = ledger_path or self.ledger_path
+        if isinstance(signed_entry, SignedEntry):
+            line = signed_entry.line
+        elif orjson is not None:
+            line = orjson.dumps(signed_entry, option=orjson.OPT_APPEND_NEWLINE)
+        else:
+            line = (json.dumps(signed_entry) + "\n").encode()
+
+        with self._ledger_lock:
+            pending = self._pending.setdefault(path, [])
+            pending.append(line)
+            if durable:
+                self._flush_locked()
+            elif len(pending) >= LEDGER_BATCH_SIZE:
+                self._flush_or_report()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(LEDGER_FLUSH_INTERVAL, self._timed_flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush_ledger(self):
+        """Writes out every queued entry and syncs each touched ledger once."""
+        with self._ledger_lock:
+            self._flush_locked()
+
+    def _timed_flush(self):
+        with self._ledger_lock:
+            self._flush_or_report()
+
+    def _flush_or_report(self):
+        # For flushes no caller is waiting on: a failure is reported and the
+        # unwritten lines stay queued for the next flush, durable write or close
+        try:
+            self._flush_locked()
+        except OSError as e:
+            print(f"❌ [AUDITOR] Ledger flush failed, entries kept queued: {e}")
+
+    def _flush_locked(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+        # A failing ledger must not hold back the others; the first error is
+        # raised once every other path has been written
+        error = None
+        for path in list(self._pending):
+            try:
+                self._flush_path(path)
+            except OSError as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+
+    def _flush_path(self, path):
+        lines = self._pending[path]
+        if not lines:
+            del self._pending[path]
+            return
+
+        fd = self._ledger_fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            self._ledger_fds[path] = fd
+        count = len(lines)
+        while lines:
+            # writev may stop short; drop what reached the file so a failure
+            # leaves only the unwritten bytes queued, never a second copy
+            written = os.writev(fd, lines[:WRITEV_MAX_LINES])
+            done = 0
+            while done < len(lines) and written >= len(lines[done]):
+                written -= len(lines[done])
+                done += 1
+            del lines[:done]
+            if written:
+                lines[0] = lines[0][written:]
+        del self._pending[path]
+        os.fdatasync(fd)
+        print(f"📜 [AUDITOR] Inscribed {count} transaction(s) in ledger: {path}")
 
-    def write_to_ledger(self, signed_entry, ledger_path="/data/vault/forensic_ledger.jsonl"):
-        """Appends the signed entry to the append-only ledger."""
-        with open(ledger_path, "a") as f:
-            f.write(json.dumps(signed_entry) + "\n")
-        print(f"📜 [AUDITOR] Inscribed transaction in ledger: {signed_entry['signature'][:12]}...")
+    def close(self):
+        """Flushes pending entries and releases the ledger descriptors."""
+        with self._ledger_lock:
+            try:
+                self._flush_locked()
+            finally:
+                for fd in self._ledger_fds.values():
+                    os.close(fd)
+                self._ledger_fds.clear()
 
 if __name__ == "__main__":
     auditor = Auditor()
@@ -81,3 +288,4 @@ if __name__ == "__main__":
     test_content = "Mock scam call transcript fragment: 'I need your password...'"
     entry = auditor.process_log_entry("CALL_FRAGMENT", test_content, "Brian_Sovereign")
     auditor.write_to_ledger(entry)
+    auditor.close()
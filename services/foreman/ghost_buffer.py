@@ -1,45 +1,135 @@
 import time
+import asyncio
+import logging
+from collections import deque
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
+logger = logging.getLogger(__name__)
+
+# Built once; each handover fills it with a single %-format
+HANDOVER_PROMPT = (
+    "\n        System: %s\n        \n"
+    "        Recent Conversation History:\n        %s\n        \n"
+    "        Human just handed over the call to you. \n"
+    "        Continue the conversation seamlessly in character.\n        "
+)
+
 class GhostBuffer:
-    def __init__(self, ollama_url="http://ollama:11434"):
+    def __init__(self, ollama_url="http://ollama:11434", max_lines=512, max_ctx_chars=6000):
         self.ollama_url = ollama_url
-        self.buffer = []
+        # (timestamp, speaker, text) tuples; formatted only when context is read
+        self.buffer = deque(maxlen=max_lines)
+        self.max_ctx_chars = max_ctx_chars
+        self._context = None # get_context() result until the next capture
         self.is_active = False
 
+        # Keep-alive pool so a handover doesn't pay a fresh handshake to Ollama
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Connection": "keep-alive", "Accept-Encoding": "gzip"})
+        self._async_client = None
+
     def capture_transcript(self, text, speaker="Scammer"):
         """Adds a line of transcript to the buffer."""
         timestamp = time.strftime("%H:%M:%S")
-        entry = f"[{timestamp}] {speaker}: {text}"
-        self.buffer.append(entry)
-        print(f"Captured: {entry}")
+        self.buffer.append((timestamp, speaker, text))
+        self._context = None
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Captured: [{timestamp}] {speaker}: {text}")
 
     def get_context(self):
-        """Returns the full context for the LLM."""
-        return "\n".join(self.buffer)
+        """Returns the most recent lines that fit in max_ctx_chars for the LLM."""
+        if self._context is not None:
+            return self._context
+
+        lines = []
+        budget = self.max_ctx_chars
+        for timestamp, speaker, text in reversed(self.buffer):
+            line = f"[{timestamp}] {speaker}: {text}"
+            budget -= len(line) + 1
+            if budget < 0 and lines:
+                break
+            lines.append(line)
+        lines.reverse()
+        self._context = "\n".join(lines)
+        return self._context
+
+    def _handover_prompt(self, persona_prompt):
+        return HANDOVER_PROMPT % (persona_prompt, self.get_context())
 
-    def trigger_handover(self, persona_prompt):
+    def trigger_handover(self, persona_prompt, pregenerate=False):
         """Prepares the AI with the current context."""
-        context = self.get_context()
+        full_prompt = self._handover_prompt(persona_prompt)
         print("\n--- TRIGGERING HANDOVER ---")
         
-        full_prompt = f"""
-        System: {persona_prompt}
-        
-        Recent Conversation History:
-        {context}
-        
-        Human just handed over the call to you. 
-        Continue the conversation seamlessly in character.
-        """
-        
-        # This would call Ollama to pre-generate or start the session
-        # requests.post(f"{self.ollama_url}/api/generate", json={"model": "llama3", "prompt": full_prompt})
+        # Optionally have Ollama pre-generate / start the session
+        if pregenerate:
+            try:
+                self.session.post(
+                    f"{self.ollama_url}/api/generate",
+                    json={"model": "llama3", "prompt": full_prompt, "stream": False},
+                    timeout=(3, 30)
+                )
+            except Exception as e:
+                print(f"Pre-generation failed: {e}")
         
         return full_prompt
 
+    async def trigger_handover_async(self, persona_prompt, model="llama3"):
+        """
+        Hands over without blocking the event loop: warms the persona into
+        Ollama and generates the first in-character reply concurrently.
+        Returns (full_prompt, first_reply); first_reply is None on failure.
+        Ollama only overlaps the two if OLLAMA_NUM_PARALLEL > 1.
+        """
+        full_prompt = self._handover_prompt(persona_prompt)
+        print("\n--- TRIGGERING HANDOVER (async) ---")
+
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.ollama_url,
+                timeout=httpx.Timeout(30.0, connect=3.0)
+            )
+
+        warmup = self._async_client.post("/api/generate", json={
+            "model": model, "prompt": persona_prompt, "stream": False,
+            "keep_alive": "10m", "options": {"num_predict": 1}
+        })
+        first_reply = self._async_client.post("/api/generate", json={
+            "model": model, "prompt": full_prompt, "stream": False, "keep_alive": "10m"
+        })
+        _, reply = await asyncio.gather(warmup, first_reply, return_exceptions=True)
+
+        if isinstance(reply, Exception):
+            print(f"Handover generation failed: {reply}")
+            return full_prompt, None
+        try:
+            reply.raise_for_status()
+            body = reply.json()
+        except (httpx.HTTPStatusError, ValueError) as e:
+            # Error statuses and non-JSON bodies (e.g. a proxy's 502 page)
+            print(f"Handover generation failed: {e}")
+            return full_prompt, None
+        return full_prompt, body.get("response") if isinstance(body, dict) else None
+
+    def close(self):
+        """Releases pooled connections to Ollama."""
+        self.session.close()
+
+    async def aclose(self):
+        """Releases both the sync and async connection pools."""
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     gb = GhostBuffer()
     
     # Simulate a call
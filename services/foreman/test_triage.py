@@ -0,0 +1,51 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from urllib3.connection import HTTPConnection
+
+import triage
+
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _triage(number):
+    return triage.app.test_client().post("/triage", json={"number": number})
+
+def test_refused_connect_is_attempted_once():
+    url = f"http://127.0.0.1:{_closed_port()}/check-number"
+    with mock.patch.object(triage, "DATABASE_URL", url), \
+         mock.patch.object(HTTPConnection, "_new_conn", autospec=True, side_effect=HTTPConnection._new_conn) as connect:
+        response = _triage("+15550100")
+
+    assert connect.call_count == 1
+    assert response.get_json()["action"] == "DEFAULT_RING"
+
+def test_gateway_errors_are_retried_twice():
+    hits = []
+
+    class Unavailable(BaseHTTPRequestHandler):
+        def do_POST(self):
+            hits.append(self.path)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Unavailable)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/check-number"
+        with mock.patch.object(triage, "DATABASE_URL", url):
+            response = _triage("+15550101")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(hits) == 3
+    assert response.get_json()["action"] == "DEFAULT_RING"
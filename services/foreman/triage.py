@@ -1,35 +1,119 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 app = Flask(__name__)
 
+# Same provider as steward/api.py: each service image ships only its own
+# module, so the few lines are copied rather than shared
+class ORJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+if orjson is not None:
+    app.json = ORJSONProvider(app)
+
 # The Blacklist/Learning Repo connection
 DATABASE_URL = os.environ.get("LEARNING_REPO_URL", "http://learning-repo:5000/check-number")
 
+# Shared keep-alive pool for learning-repo lookups, retrying brief gateway
+# errors. Connect and read failures (timeouts included) are not retried: a
+# dead or hung Learning Repo must cost the ring path one timeout, not three.
+_LR_SESSION = requests.Session()
+_LR_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, connect=0, read=0, backoff_factor=0.1, status_forcelist=[502, 503, 504], allowed_methods=None)
+))
+
+# Robo-dial campaigns repeat the same numbers, so keep recent verdicts around.
+# Clean verdicts expire sooner so new blacklist entries propagate quickly.
+LOOKUP_CACHE_SIZE = 50_000
+SCAM_TTL = 3600
+CLEAN_TTL = 300
+
+_lookup_cache = OrderedDict() # number -> (expires_at, status)
+_lookup_lock = threading.Lock()
+
+def _cached_status(number):
+    with _lookup_lock:
+        hit = _lookup_cache.get(number)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del _lookup_cache[number]
+            return None
+        _lookup_cache.move_to_end(number)
+        return hit[1]
+
+def _cache_status(number, status):
+    ttl = SCAM_TTL if status.get('is_scam') else CLEAN_TTL
+    with _lookup_lock:
+        _lookup_cache[number] = (time.monotonic() + ttl, status)
+        _lookup_cache.move_to_end(number)
+        if len(_lookup_cache) > LOOKUP_CACHE_SIZE:
+            _lookup_cache.popitem(last=False)
+
+# Health and the only two verdicts triage returns never change, so they are
+# encoded once here rather than per request
+HEALTH_BODY = app.json.dumps({"status": "active", "service": "foreman"})
+COMBAT_RING_BODY = app.json.dumps({
+    "action": "COMBAT_RING",
+    "multiplier": "5x",
+    "persona_suggestion": "Hazel"
+})
+DEFAULT_RING_BODY = app.json.dumps({"action": "DEFAULT_RING", "multiplier": "1x"})
+
+@app.route('/health')
+def health():
+    return Response(HEALTH_BODY, mimetype="application/json")
+
 @app.route('/triage', methods=['POST'])
 def triage_call():
-    incoming_number = request.json.get('number')
+    body = request.get_json(silent=True)
+    incoming_number = body.get('number') if isinstance(body, dict) else None
     if not incoming_number:
         return jsonify({"error": "No number provided"}), 400
+    if not isinstance(incoming_number, str):
+        # Also the verdict cache key, which must be hashable
+        return jsonify({"error": "number must be a string"}), 400
     
     # Check if number is in the Learning Repo or known blacklist
-    try:
-        response = requests.post(DATABASE_URL, json={"number": incoming_number}, timeout=2)
-        status = response.json()
-    except Exception as e:
-        print(f"Fallback: Database offline ({e})")
-        status = {'is_scam': False}
+    status = _cached_status(incoming_number)
+    if status is None:
+        try:
+            response = _LR_SESSION.post(DATABASE_URL, json={"number": incoming_number}, timeout=2)
+            response.raise_for_status()
+            status = response.json()
+            if not isinstance(status, dict):
+                raise ValueError(f"unexpected Learning Repo reply {status!r}")
+            # Only real verdicts are cached; an error body must not pass for "clean"
+            if 'is_scam' in status:
+                _cache_status(incoming_number, status)
+        except Exception as e:
+            # Not cached: the next call retries the Learning Repo
+            print(f"Fallback: Database offline ({e})")
+            status = {'is_scam': False}
     
     if status.get('is_scam'):
         # Returns a 'Combat' flag to your phone (via Tasker/Termux)
-        return jsonify({
-            "action": "COMBAT_RING", 
-            "multiplier": "5x",
-            "persona_suggestion": "Hazel"
-        })
+        return Response(COMBAT_RING_BODY, mimetype="application/json")
     
-    return jsonify({"action": "DEFAULT_RING", "multiplier": "1x"})
+    return Response(DEFAULT_RING_BODY, mimetype="application/json")
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8080))
@@ -1,32 +1,107 @@
-from flask import Flask, jsonify, send_from_directory
-import sqlite3
+from flask import Flask, Response, abort, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+import hashlib
+import math
+import mimetypes
 import os
+import sqlite3
 import threading
 from steward import Steward
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__)
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Routes jsonify/get_json through orjson's C encoder and parser."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+if orjson is not None:
+    app.json = ORJSONProvider(app)
+
 steward = Steward()
 
+def load_dashboard(root):
+    """Reads the dashboard into memory once: path -> (body, mimetype, etag)."""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            with open(full_path, "rb") as f:
+                body = f.read()
+            path = os.path.relpath(full_path, root).replace(os.sep, "/")
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            files[path] = (body, mimetype, hashlib.sha1(body).hexdigest())
+    return files
+
+DASHBOARD = load_dashboard(os.path.join(app.root_path, 'dashboard'))
+
+# Static for the life of the process, so probes get pre-encoded bytes
+HEALTH_BODY = app.json.dumps({
+    "status": "active",
+    "service": "steward",
+    "mode": "Sovereign",
+    "integrity": "verified",
+    "db_path": steward.db_path
+})
+
+@app.route('/health')
+def health():
+    return Response(HEALTH_BODY, mimetype="application/json")
+
 @app.route('/api/leaderboard')
 def get_leaderboard():
-    results = steward.get_leaderboard()
-    leaderboard = []
-    for row in results:
-        leaderboard.append({
-            "user_id": row[0],
-            "level": row[1],
-            "credits": row[2],
-            "total_time_wasted": row[3]
-        })
-    return jsonify(leaderboard)
+    # Rows arrive already encoded as a JSON array; no per-row dicts here
+    return Response(steward.get_leaderboard_json(), mimetype="application/json")
+
+def call_error(call):
+    """Why a /api/log_calls item can't be logged, or None if it can."""
+    if not isinstance(call, dict):
+        return "each call must be an object"
+    for field in ("user_id", "session_id"):
+        if not isinstance(call.get(field), str):
+            return f"{field} must be a string"
+    if not isinstance(call.get("scam_type", ""), str):
+        return "scam_type must be a string"
+    duration = call.get("duration_seconds")
+    if isinstance(duration, bool) or not isinstance(duration, (int, float)) or duration < 0:
+        return "duration_seconds must be a non-negative number"
+    if isinstance(duration, float) and not math.isfinite(duration):
+        return "duration_seconds must be finite"
+    return None
+
+@app.route('/api/log_calls', methods=['POST'])
+def log_calls():
+    # One request, one transaction for a whole batch of finished sessions
+    body = request.get_json(silent=True)
+    calls = body.get("calls") if isinstance(body, dict) else None
+    if not calls or not isinstance(calls, list):
+        return jsonify({"error": "No calls provided"}), 400
+    for call in calls:
+        error = call_error(call)
+        if error:
+            return jsonify({"error": f"Malformed call: {error}"}), 400
+
+    try:
+        results = steward.log_call_batch(calls)
+    except (KeyError, TypeError, ValueError, OverflowError, sqlite3.ProgrammingError) as e:
+        return jsonify({"error": f"Malformed call: {e}"}), 400
+    except sqlite3.IntegrityError as e:
+        # Duplicate or already-logged session_id; the batch was rolled back
+        return jsonify({"error": f"Conflicting call: {e}"}), 409
+
+    return jsonify([{"credits_earned": credits, "level": level} for credits, level in results])
 
 @app.route('/api/stats/<user_id>')
 def get_user_stats(user_id):
-    conn = sqlite3.connect(steward.db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    row = steward.get_user_stats(user_id)
     
     if row:
         return jsonify({
@@ -41,7 +116,15 @@ def get_user_stats(user_id):
 @app.route('/')
 @app.route('/<path:path>')
 def serve_dashboard(path='index.html'):
-    return send_from_directory('dashboard', path)
+    if path not in DASHBOARD:
+        abort(404)
+    body, mimetype, etag = DASHBOARD[path]
+    response = Response(body, mimetype=mimetype)
+    # Asset names aren't content-hashed, so browsers revalidate every time;
+    # an unchanged file costs a 304 with no body
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 if __name__ == "__main__":
     # Start the Flask API
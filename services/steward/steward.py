@@ -1,8 +1,63 @@
 import os
+import queue
 import sqlite3
+import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime
 
+LEADERBOARD_TTL = 60 # seconds; any committed write invalidates sooner
+
+# Mode Multipliers (Master-Student Logic), doubled to keep credit math integral
+MODE_MULTIPLIERS_X2 = {
+    "auto": 2,
+    "handoff": 4,
+    "live": 10 # The "myTIME" Master-Student bonus (5x)
+}
+
+INSERT_SESSION_SQL = '''
+    INSERT INTO call_sessions (session_id, user_id, start_time, end_time, duration_seconds, scam_type, is_unique, credits_earned)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+class _ConnPool:
+    """
+    Long-lived SQLite connections handed out LIFO, so the most recently
+    used connection (warmest page cache) serves the next request.
+    """
+    def __init__(self, db_path, size=8):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        # "file:" URIs allow a shared in-memory database (mode=memory&cache=shared)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, uri=self.db_path.startswith("file:"))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-20000") # ~20 MB
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=134217728") # 128 MB of the file read via mmap
+        conn.execute("PRAGMA busy_timeout=5000") # Wait out a concurrent writer instead of failing
+        return conn
+
+    @contextmanager
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
 class Steward:
     def __init__(self, db_path=None):
         if db_path is None:
@@ -13,104 +68,194 @@ class Steward:
                 db_path = os.path.join(os.path.dirname(__file__), "steward.db")
         
         self.db_path = db_path
+        self._pool = _ConnPool(db_path)
+        self._leaderboard_cache = {} # limit -> (fetched_at, data_version, rows)
         self._init_db()
 
+        # PRAGMA data_version changes whenever another connection commits,
+        # including other gunicorn workers, so cached rows are tied to the
+        # version read before they were fetched. This connection only ever
+        # reads, or its own writes would go unnoticed.
+        self._version_conn = self._pool._connect()
+        self._version_lock = threading.Lock()
+
     def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._pool.acquire() as conn:
+            cursor = conn.cursor()
         
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id TEXT PRIMARY KEY,
-                credits INTEGER DEFAULT 0,
-                level INTEGER DEFAULT 1,
-                xp INTEGER DEFAULT 0,
-                total_time_wasted INTEGER DEFAULT 0
-            )
-        ''')
+            # Users table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id TEXT PRIMARY KEY,
+                    credits INTEGER DEFAULT 0,
+                    level INTEGER DEFAULT 1,
+                    xp INTEGER DEFAULT 0,
+                    total_time_wasted INTEGER DEFAULT 0
+                )
+            ''')
         
-        # Calls/Sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS call_sessions (
-                session_id TEXT PRIMARY KEY,
-                user_id TEXT,
-                start_time TIMESTAMP,
-                end_time TIMESTAMP,
-                duration_seconds INTEGER,
-                scam_type TEXT,
-                is_unique BOOLEAN,
-                credits_earned INTEGER,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        ''')
+            # Calls/Sessions table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS call_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_id TEXT,
+                    start_time TIMESTAMP,
+                    end_time TIMESTAMP,
+                    duration_seconds INTEGER,
+                    scam_type TEXT,
+                    is_unique BOOLEAN,
+                    credits_earned INTEGER,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                )
+            ''')
+
+            # Leaderboard reads walk this index instead of sorting the table
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_ttw ON users (total_time_wasted DESC)')
         
-        conn.commit()
-        conn.close()
+            conn.commit()
 
     def calculate_credits(self, duration_seconds, is_unique=False, ai_on_ai=False, mode="auto", is_cloned_voice=False):
-        # Base: 10 credits per minute
-        base_credits = (duration_seconds // 60) * 10
-        
-        # Mode Multipliers (Master-Student Logic)
-        mode_multipliers = {
-            "auto": 1,
-            "handoff": 2,
-            "live": 5 # The "myTIME" Master-Student bonus
-        }
+        # Base: 10 credits per minute; JSON callers may send float seconds
+        base_credits = (int(duration_seconds) // 60) * 10
         
-        multiplier = mode_multipliers.get(mode, 1.0)
-        
-        if is_cloned_voice:
-            multiplier *= 2.0 # Doppelgänger Bonus
-        if is_unique:
-            multiplier += 2.0  # 3x for new/unique scams
-        if ai_on_ai:
-            multiplier += 1.5  # 2.5x for AI detection/combat
+        # Multipliers are kept doubled so the whole formula stays in integers:
+        # mode (x2 if cloned voice) + 2.0 unique + 1.5 AI-on-AI, halved at the end
+        multiplier_x2 = MODE_MULTIPLIERS_X2.get(mode, 2) << bool(is_cloned_voice)
+        multiplier_x2 += 4 * bool(is_unique) + 3 * bool(ai_on_ai)
             
-        return int(base_credits * multiplier)
+        return base_credits * multiplier_x2 // 2
 
     def log_call(self, user_id, session_id, duration_seconds, scam_type="unknown", is_unique=False, ai_on_ai=False, mode="auto", is_cloned_voice=False):
         credits_earned = self.calculate_credits(duration_seconds, is_unique, ai_on_ai, mode, is_cloned_voice)
         xp_earned = duration_seconds // 10 # 1 XP per 10 seconds
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Update or create user
-        cursor.execute('''
-            INSERT INTO users (user_id, credits, xp, total_time_wasted)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-                credits = credits + ?,
-                xp = xp + ?,
-                total_time_wasted = total_time_wasted + ?
-        ''', (user_id, credits_earned, xp_earned, duration_seconds, credits_earned, xp_earned, duration_seconds))
+        with self._pool.acquire() as conn:
+            cursor = conn.cursor()
         
-        # Handle leveling up (Level = sqrt(XP/100) + 1 approx)
-        cursor.execute('SELECT xp FROM users WHERE user_id = ?', (user_id,))
-        xp = cursor.fetchone()[0]
-        new_level = int((xp / 100) ** 0.5) + 1
-        cursor.execute('UPDATE users SET level = ? WHERE user_id = ?', (new_level, user_id))
+            # Update or create user, reading back the new XP in the same statement
+            cursor.execute('''
+                INSERT INTO users (user_id, credits, xp, total_time_wasted)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    credits = credits + excluded.credits,
+                    xp = xp + excluded.xp,
+                    total_time_wasted = total_time_wasted + excluded.total_time_wasted
+                RETURNING xp, level
+            ''', (user_id, credits_earned, xp_earned, duration_seconds))
+            xp, old_level = cursor.fetchone()
         
-        # Log session
-        cursor.execute('''
-            INSERT INTO call_sessions (session_id, user_id, start_time, end_time, duration_seconds, scam_type, is_unique, credits_earned)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (session_id, user_id, datetime.now(), datetime.now(), duration_seconds, scam_type, is_unique, credits_earned))
+            # Handle leveling up (Level = sqrt(XP/100) + 1 approx); most calls
+            # don't cross a boundary, so the row is only rewritten when one does
+            new_level = int((xp / 100) ** 0.5) + 1
+            if new_level != old_level:
+                cursor.execute('UPDATE users SET level = ? WHERE user_id = ?', (new_level, user_id))
         
-        conn.commit()
-        conn.close()
+            # Log session in the same transaction: a reused session_id raises
+            # IntegrityError here and the credits above are rolled back
+            now = datetime.now()
+            cursor.execute(INSERT_SESSION_SQL, (session_id, user_id, now, now, duration_seconds, scam_type, is_unique, credits_earned))
+
+            conn.commit()
+
         return credits_earned, new_level
 
+    def log_call_batch(self, calls):
+        """
+        Logs many calls in one transaction. Each call is a dict of log_call's
+        arguments; returns (credits_earned, level) per call, in order.
+        """
+        now = datetime.now()
+        totals = {} # user_id -> [credits, xp, seconds]
+        session_rows = []
+        earned = []
+        for call in calls:
+            duration = call["duration_seconds"]
+            is_unique = call.get("is_unique", False)
+            credits = self.calculate_credits(duration, is_unique, call.get("ai_on_ai", False), call.get("mode", "auto"), call.get("is_cloned_voice", False))
+            user_totals = totals.setdefault(call["user_id"], [0, 0, 0])
+            user_totals[0] += credits
+            user_totals[1] += duration // 10
+            user_totals[2] += duration
+            session_rows.append((call["session_id"], call["user_id"], now, now, duration, call.get("scam_type", "unknown"), is_unique, credits))
+            earned.append(credits)
+
+        with self._pool.acquire() as conn:
+            # One upsert per user, not per call
+            conn.executemany('''
+                INSERT INTO users (user_id, credits, xp, total_time_wasted)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    credits = credits + excluded.credits,
+                    xp = xp + excluded.xp,
+                    total_time_wasted = total_time_wasted + excluded.total_time_wasted
+            ''', [(user_id, *user_totals) for user_id, user_totals in totals.items()])
+
+            levels = {}
+            level_changes = []
+            for user_id in totals:
+                xp, old_level = conn.execute('SELECT xp, level FROM users WHERE user_id = ?', (user_id,)).fetchone()
+                levels[user_id] = int((xp / 100) ** 0.5) + 1
+                if levels[user_id] != old_level:
+                    level_changes.append((levels[user_id], user_id))
+            conn.executemany('UPDATE users SET level = ? WHERE user_id = ?', level_changes)
+
+            conn.executemany(INSERT_SESSION_SQL, session_rows)
+            conn.commit()
+
+        return [(credits, levels[call["user_id"]]) for credits, call in zip(earned, calls)]
+
+    def _data_version(self):
+        with self._version_lock:
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _cached_leaderboard(self, key, version):
+        cached = self._leaderboard_cache.get(key)
+        if cached and cached[1] == version and time.monotonic() - cached[0] < LEADERBOARD_TTL:
+            return cached[2]
+        return None
+
     def get_leaderboard(self, limit=10):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT user_id, level, credits, total_time_wasted FROM users ORDER BY total_time_wasted DESC LIMIT ?', (limit,))
-        results = cursor.fetchall()
-        conn.close()
+        # A tuple, so a caller can't mutate the rows every other caller is served
+        version = self._data_version()
+        results = self._cached_leaderboard(limit, version)
+        if results is not None:
+            return results
+
+        with self._pool.acquire() as conn:
+            cursor = conn.execute('SELECT user_id, level, credits, total_time_wasted FROM users ORDER BY total_time_wasted DESC LIMIT ?', (limit,))
+            results = tuple(cursor.fetchall())
+
+        self._leaderboard_cache[limit] = (time.monotonic(), version, results)
         return results
 
+    def get_leaderboard_json(self, limit=10):
+        """The leaderboard as a ready-to-send JSON array, serialized by SQLite."""
+        key = ("json", limit)
+        version = self._data_version()
+        body = self._cached_leaderboard(key, version)
+        if body is not None:
+            return body
+
+        with self._pool.acquire() as conn:
+            cursor = conn.execute('''
+                SELECT json_group_array(json_object(
+                    'user_id', user_id,
+                    'level', level,
+                    'credits', credits,
+                    'total_time_wasted', total_time_wasted
+                ))
+                FROM (SELECT * FROM users ORDER BY total_time_wasted DESC LIMIT ?)
+            ''', (limit,))
+            body = cursor.fetchone()[0]
+
+        self._leaderboard_cache[key] = (time.monotonic(), version, body)
+        return body
+
+    def get_user_stats(self, user_id):
+        with self._pool.acquire() as conn:
+            cursor = conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+            return cursor.fetchone()
+
 if __name__ == "__main__":
     # Example usage / Test
     steward = Steward()